@@ -1,12 +1,27 @@
-import osmnx as ox
-import networkx as nx
-import folium
+import json
 import numpy as np
-from math import radians, cos, sin, asin, sqrt
-import time
-from typing import Dict, Tuple, List
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple, List, NamedTuple
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Ahead-of-time build from build_kernels.py, skips JIT compilation
+    from route_kernels import dijkstra_batch
+except ImportError:
+    try:
+        from kernels import dijkstra_batch
+    except ImportError:
+        # Numba is not installed, use SciPy's compiled Dijkstra instead
+        from csgraph_kernels import dijkstra_batch
+
 # Define the hospitals with coordinates
 hospital_locations = {
     'Apollo Speciality Hospitals': (9.92845107063264, 78.1490877660568),
@@ -21,15 +36,53 @@ hospital_locations = {
 # Current location
 current_location = (9.918335304387874, 78.1134397514805)
 
-def display_loading_animation(duration: int = 3):
-    """Display a simple loading animation in the terminal"""
-    animation = "|/-\\"
-    for _ in range(duration * 10):
-        for char in animation:
-            sys.stdout.write(f'\rLoading... {char}')
+class RoadNetwork(NamedTuple):
+    """Road graph in CSR form with node coordinates as flat arrays"""
+    indptr: np.ndarray      # int32, n + 1
+    indices: np.ndarray     # int32, m
+    weights: np.ndarray     # float32, m (edge length in metres)
+    xs: np.ndarray          # float64, n (longitude)
+    ys: np.ndarray          # float64, n (latitude)
+    node_ids: np.ndarray    # OSM node id for each CSR index
+    rev_indptr: np.ndarray  # int32, n + 1 (incoming edges grouped by target)
+    rev_edges: np.ndarray   # int32, m (forward edge id of each incoming edge)
+    rev_indices: np.ndarray # int32, m (source node of each incoming edge)
+
+class HospitalTrees(NamedTuple):
+    """Shortest-path trees into each hospital, in hospital_locations order"""
+    hospital_nodes: np.ndarray  # int32, h (CSR index nearest each hospital)
+    hospital_dist: np.ndarray   # float32, (h, n) (road distance to the hospital)
+    hospital_pred: np.ndarray   # int32, (h, n) (next node towards the hospital)
+
+class Routes(NamedTuple):
+    """Routes as rows of CSR node indices padded with -1, shortest first"""
+    paths: np.ndarray    # int32, (k, max_len)
+    lengths: np.ndarray  # int32, k (number of nodes in each path)
+    dists: np.ndarray    # float32, k (route length in metres)
+
+@contextmanager
+def loading_animation():
+    """Display a simple loading animation in the terminal while work runs"""
+    stop = threading.Event()
+
+    def spin():
+        animation = "|/-\\"
+        i = 0
+        while not stop.is_set():
+            sys.stdout.write(f'\rLoading... {animation[i % len(animation)]}')
             sys.stdout.flush()
-            time.sleep(0.1)
-    sys.stdout.write('\r' + ' ' * 20 + '\r')
+            i += 1
+            stop.wait(0.1)
+        sys.stdout.write('\r' + ' ' * 20 + '\r')
+        sys.stdout.flush()
+
+    spinner = threading.Thread(target=spin, daemon=True)
+    spinner.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        spinner.join()
 
 def display_hospitals():
     """Display available hospitals with numbered options"""
@@ -52,114 +105,224 @@ def get_user_selection() -> str:
         except ValueError:
             print("Please enter a valid number.")
 
-def calculate_alternative_routes(G, start_node: int, end_node: int, 
-                              num_routes: int = 3) -> List[Tuple[List[int], float]]:
-    """Calculate multiple routes between two points"""
-    routes = []
-    for i in range(num_routes):
-        try:
-            if i == 0:
-                # First route - shortest path
-                route = nx.astar_path(G, start_node, end_node, weight='length')
-                distance = nx.astar_path_length(G, start_node, end_node, weight='length')
-            else:
-                # Alternative routes by temporarily removing some nodes from shortest path
-                temp_G = G.copy()
-                for prev_route, _ in routes:
-                    # Remove some random nodes from previous routes
-                    nodes_to_remove = np.random.choice(prev_route[1:-1], 
-                                                     size=min(3, len(prev_route)-2), 
-                                                     replace=False)
-                    temp_G.remove_nodes_from(nodes_to_remove)
-                route = nx.astar_path(temp_G, start_node, end_node, weight='length')
-                distance = nx.astar_path_length(temp_G, start_node, end_node, weight='length')
-            routes.append((route, distance))
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
-            continue
-    return routes
-
-def create_map_with_alternatives(G, current_loc: Tuple[float, float], 
-                               hospital_name: str, routes: List[Tuple[List[int], float]]):
-    """Create an interactive map with alternative routes"""
-    m = folium.Map(location=current_loc, zoom_start=13)
-
-    # Add marker for current location
-    folium.Marker(
-        current_loc,
-        popup='Your Location',
-        icon=folium.Icon(color='green', icon='info-sign')
-    ).add_to(m)
-
-    # Add hospital marker
+def load_road_network(location: Tuple[float, float], hospitals: Dict[str, Tuple[float, float]],
+                      dist: int = 5000,
+                      network_type: str = 'drive') -> Tuple[RoadNetwork, HospitalTrees]:
+    """Load the routing arrays from the local cache, building them on a miss"""
+    # Key the cache file on the query so a changed area is never served stale
+    key = hashlib.sha1(repr((location, tuple(hospitals.items()), dist,
+                             network_type)).encode()).hexdigest()[:12]
+    cache_file = f'road_{key}.npz'
+    if os.path.exists(cache_file):
+        with np.load(cache_file) as data:
+            return (RoadNetwork(*(data[field] for field in RoadNetwork._fields)),
+                    HospitalTrees(*(data[field] for field in HospitalTrees._fields)))
+    # OSMnx pulls in the whole geo stack, so only import it on a cache miss
+    import osmnx as ox
+    G = ox.graph_from_point(location, dist=dist, network_type=network_type)
+    if not G.graph.get('simplified'):
+        G = ox.simplify_graph(G)
+    # Merge the cluster of nodes at each complex intersection into one node,
+    # which needs a projected graph for the tolerance to be in metres
+    G = ox.consolidate_intersections(ox.project_graph(G), tolerance=10,
+                                     rebuild_graph=True, dead_ends=False)
+    G = ox.project_graph(G, to_crs='epsg:4326')
+    net = graph_to_csr(G)
+    trees = build_hospital_trees(net, hospitals)
+    np.savez_compressed(cache_file, **net._asdict(), **trees._asdict())
+    return net, trees
+
+def graph_to_csr(G) -> RoadNetwork:
+    """Convert an OSMnx graph into CSR arrays indexed by contiguous node ids"""
+    node_ids = np.fromiter(G.nodes, dtype=np.int64, count=len(G))
+    node_index = {node: i for i, node in enumerate(node_ids.tolist())}
+    n, m = len(node_ids), G.number_of_edges()
+
+    # Gather edges as (source, target, length) and group them by source
+    src = np.fromiter((node_index[u] for u, _ in G.edges()), np.int32, m)
+    dst = np.fromiter((node_index[v] for _, v in G.edges()), np.int32, m)
+    lengths = np.fromiter((length for _, _, length in G.edges(data='length', default=0.0)),
+                          np.float32, m)
+    order = np.lexsort((lengths, dst, src))
+    src, dst, lengths = src[order], dst[order], lengths[order]
+
+    # The MultiDiGraph can hold parallel edges between the same two nodes;
+    # only the shortest of them can be on a shortest path, so keep just that
+    keep = np.ones(m, dtype=bool)
+    keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+
+    indptr = np.empty(n + 1, np.int32)
+    indptr[0] = 0
+    np.cumsum(np.bincount(src[keep], minlength=n), out=indptr[1:])
+    indices = np.ascontiguousarray(dst[keep])
+    weights = np.ascontiguousarray(lengths[keep])
+
+    # Reverse CSR over edge ids, so incoming edges can be masked too
+    rev_indptr = np.empty(n + 1, np.int32)
+    rev_indptr[0] = 0
+    np.cumsum(np.bincount(indices, minlength=n), out=rev_indptr[1:])
+    rev_edges = np.argsort(indices, kind='stable').astype(np.int32)
+    rev_indices = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))[rev_edges]
+
+    xs = np.fromiter((d['x'] for _, d in G.nodes(data=True)), np.float64, n)
+    ys = np.fromiter((d['y'] for _, d in G.nodes(data=True)), np.float64, n)
+    return RoadNetwork(indptr, indices, weights, xs, ys, node_ids,
+                       rev_indptr, rev_edges, rev_indices)
+
+def build_hospital_trees(net: RoadNetwork,
+                         hospitals: Dict[str, Tuple[float, float]]) -> HospitalTrees:
+    """Grow a full shortest-path tree into every hospital on the reversed graph"""
+    nodes = nearest_nodes(net, np.array(list(hospitals.values()))).astype(np.int32)
+    weight_matrix = np.tile(net.weights[net.rev_edges], (len(nodes), 1))
+    dist, pred = dijkstra_batch(net.rev_indptr, net.rev_indices, weight_matrix,
+                                nodes, -1, np.zeros(len(net.xs), np.float32))
+    return HospitalTrees(nodes, dist, pred)
+
+def mask_nodes(net: RoadNetwork, weights: np.ndarray, nodes) -> None:
+    """Remove nodes from a weights copy by setting every incident edge to inf.
+
+    weights may also be a (k, m) stack of copies, masked in every row.
+    """
+    for node in nodes:
+        weights[..., net.indptr[node]:net.indptr[node + 1]] = np.inf
+        weights[..., net.rev_edges[net.rev_indptr[node]:net.rev_indptr[node + 1]]] = np.inf
+
+def nearest_nodes(net: RoadNetwork, points: np.ndarray) -> np.ndarray:
+    """Return the CSR index of the closest node to each (lat, lon) point"""
+    points = np.radians(np.atleast_2d(points))
+    lat = points[:, 0:1]
+    lon = points[:, 1:2]
+    ys = np.radians(net.ys)
+    xs = np.radians(net.xs)
+    # Haversine term for every query against every node in one (k, n) pass;
+    # arcsin(sqrt(a)) is monotonic so the argmin can be taken on a directly
+    a = (np.sin((ys - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(ys) * np.sin((xs - lon) / 2) ** 2)
+    return np.argmin(a, axis=1)
+
+def trace_path(parent: np.ndarray, src: int, dst: int) -> List[int]:
+    """Walk a parent array back from dst to src"""
+    path = [dst]
+    while path[-1] != src:
+        path.append(int(parent[path[-1]]))
+    path.reverse()
+    return path
+
+def calculate_alternative_routes(net: RoadNetwork, src: int, dst: int,
+                              rev_dist: np.ndarray, rev_pred: np.ndarray,
+                              num_routes: int = 3) -> Routes:
+    """Calculate the shortest route and its cheapest loopless deviations.
+
+    Nodes are CSR indices. rev_dist and rev_pred are the precomputed
+    shortest-path tree into dst.
+    """
+    if not np.isfinite(rev_dist[src]):
+        return Routes(np.empty((0, 0), np.int32), np.empty(0, np.int32),
+                      np.empty(0, np.float32))
+    # First route - shortest path, read straight off the tree into dst
+    path = [src]
+    while path[-1] != dst:
+        path.append(int(rev_pred[path[-1]]))
+
+    # Alternative routes (one round of Yen's algorithm): leave the shortest
+    # path at each node u, forbidding its next edge and the nodes before u.
+    # Every spur gets its own row of masked weights so the searches can run
+    # in parallel, and the tree's exact remaining distance stays an
+    # admissible A* heuristic once edges are removed
+    spurs = np.array(path[:-1], dtype=np.int32)
+    weight_matrix = np.tile(net.weights, (len(spurs), 1))
+    for i, u in enumerate(path[:-1]):
+        if i > 0:
+            # Root nodes stay removed for this spur and every later one
+            mask_nodes(net, weight_matrix[i:], [path[i - 1]])
+        start, end = net.indptr[u], net.indptr[u + 1]
+        weight_matrix[i, start + np.flatnonzero(net.indices[start:end] == path[i + 1])] = np.inf
+    spur_dist, spur_parent = dijkstra_batch(net.indptr, net.indices, weight_matrix,
+                                            spurs, dst, rev_dist)
+
+    # Each spur leaves the shortest path at a different edge, so the
+    # candidates are all distinct and can be ranked without tracing them
+    costs = rev_dist[src] - rev_dist[spurs] + spur_dist[:, dst]
+    chosen = np.argsort(costs, kind='stable')[:num_routes - 1]
+    chosen = chosen[np.isfinite(costs[chosen])]
+    suffixes = [trace_path(spur_parent[i], path[i], dst) for i in chosen]
+
+    k = len(chosen) + 1
+    lengths = np.empty(k, np.int32)
+    lengths[0] = len(path)
+    lengths[1:] = [i + len(suffix) for i, suffix in zip(chosen, suffixes)]
+    dists = np.empty(k, np.float32)
+    dists[0] = rev_dist[src]
+    dists[1:] = costs[chosen]
+    paths = np.full((k, lengths.max()), -1, np.int32)
+    paths[0, :len(path)] = path
+    for row, (i, suffix) in enumerate(zip(chosen, suffixes), 1):
+        paths[row, :i] = path[:i]
+        paths[row, i:lengths[row]] = suffix
+
+    order = np.argsort(dists, kind='stable')
+    return Routes(paths[order], lengths[order], dists[order])
+
+def paths_to_json(paths: List[np.ndarray]) -> str:
+    """Serialize route coordinate arrays as a JSON list of [lat, lon] lists"""
+    if orjson is not None:
+        # orjson writes float64 arrays directly, without building Python lists
+        return orjson.dumps(paths, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps([path.tolist() for path in paths])
+
+def create_map_with_alternatives(net: RoadNetwork, current_loc: Tuple[float, float], 
+                               hospital_name: str, routes: Routes) -> str:
+    """Render the Leaflet map page with alternative routes as HTML"""
+    # Hospital marker location
     hospital_loc = hospital_locations[hospital_name]
     
     # Calculate average time for all routes
-    distances_km = [dist/1000 for _, dist in routes]
-    times_min = [d/40*60 for d in distances_km]  # Assuming 40 km/h average speed
+    distances_km = routes.dists.astype(np.float64) / 1000
+    times_min = distances_km / 40 * 60  # Assuming 40 km/h average speed
     
     popup_text = f"""
     <div style="min-width: 200px">
         <h4>{hospital_name}</h4>
-        <p>Shortest route: {min(distances_km):.2f} km</p>
-        <p>Est. time: {min(times_min):.1f} min</p>
+        <p>Shortest route: {distances_km.min():.2f} km</p>
+        <p>Est. time: {times_min.min():.1f} min</p>
         <p>Alternative routes available</p>
     </div>
     """
 
-    folium.Marker(
-        hospital_loc,
-        popup=folium.Popup(popup_text, max_width=300),
-        icon=folium.Icon(color='red', icon='plus', prefix='fa'),
-        tooltip=hospital_name
-    ).add_to(m)
-
-    # Sort routes by distance
-    routes.sort(key=lambda x: x[1])
-    
     # Color scheme for routes
     colors = ['green', 'darkblue', 'red']
     labels = ['Shortest Route', 'Alternative Route', 'Longest Route']
 
     # Add routes
-    for i, (route, distance) in enumerate(routes):
-        path = [(G.nodes[node]['y'], G.nodes[node]['x']) for node in route]
-        
-        folium.PolyLine(
-            locations=path,
-            weight=4 if i == 0 else 3,  # Make shortest route slightly thicker
-            color=colors[min(i, len(colors)-1)],
-            opacity=0.8,
-            popup=f"Distance: {distance/1000:.2f} km",
-            tooltip=labels[min(i, len(labels)-1)]
-        ).add_to(m)
-
-    # Add legend
-    legend_html = """
-    <div style="position: fixed; bottom: 50px; left: 50px; background-color: white;
-         padding: 10px; border: 2px solid grey; border-radius: 5px; z-index:9999;">
-        <h4>Route Legend</h4>
-        <p><span style='color: green'>━━</span> Shortest Route</p>
-        <p><span style='color: darkblue'>━━</span> Alternative Route</p>
-        <p><span style='color: red'>━━</span> Longest Route</p>
-        <p>🏥 Hospital</p>
-        <p>📍 Your Location</p>
-        <small>Times based on 40 km/h average speed</small>
-    </div>
-    """
-    m.get_root().html.add_child(folium.Element(legend_html))
+    paths = [np.column_stack((net.ys[route[:length]], net.xs[route[:length]]))
+             for route, length in zip(routes.paths, routes.lengths)]
+    route_layers = []
+    for i, distance in enumerate(routes.dists):
+        route_layers.append({
+            'weight': 4 if i == 0 else 3,  # Make shortest route slightly thicker
+            'color': colors[min(i, len(colors)-1)],
+            'popup': f"Distance: {distance/1000:.2f} km",
+            'tooltip': labels[min(i, len(labels)-1)],
+        })
 
-    return m
+    # Fill the Leaflet page template (markers, routes and legend) in one pass
+    template_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'template.html')
+    import jinja2
+    with open(template_file, encoding='utf-8') as f:
+        template = jinja2.Template(f.read())
+    return template.render(current_loc=current_loc, hospital_loc=hospital_loc,
+                           hospital_name=hospital_name, popup_html=popup_text,
+                           paths_json=paths_to_json(paths), routes=route_layers)
 
 def main():
     # Display welcome message
     print("\n=== Welcome to Hospital Route Finder ===")
     print("Finding nearby hospitals and calculating routes...")
     
-    # Show loading animation while getting road network
-    display_loading_animation(2)
-    
-    # Get road network
-    G = ox.graph_from_point(current_location, dist=5000, network_type='drive')
+    # Get road network, showing the loading animation while it runs
+    with loading_animation():
+        net, trees = load_road_network(current_location, hospital_locations,
+                                       dist=5000, network_type='drive')
     
     # Display available hospitals
     display_hospitals()
@@ -168,33 +331,32 @@ def main():
     selected_hospital = get_user_selection()
     
     print(f"\nCalculating routes to {selected_hospital}...")
-    display_loading_animation(1)
-    
-    # Calculate routes
-    current_node = ox.distance.nearest_nodes(G, current_location[1], current_location[0])
-    hospital_node = ox.distance.nearest_nodes(G, 
-                                            hospital_locations[selected_hospital][1],
-                                            hospital_locations[selected_hospital][0])
-    
-    # Get multiple routes
-    routes = calculate_alternative_routes(G, current_node, hospital_node)
+    with loading_animation():
+        # Calculate routes; the hospital side comes from the precomputed tree
+        h = list(hospital_locations).index(selected_hospital)
+        current_node = int(nearest_nodes(net, np.array(current_location))[0])
+        hospital_node = int(trees.hospital_nodes[h])
+        
+        # Get multiple routes
+        routes = calculate_alternative_routes(net, current_node, hospital_node,
+                                              trees.hospital_dist[h], trees.hospital_pred[h])
     
-    if not routes:
+    if len(routes.dists) == 0:
         print("Error: No route found to the selected hospital.")
         return
     
     # Create and save map
     print("\nGenerating interactive map...")
-    display_loading_animation(1)
-    
-    m = create_map_with_alternatives(G, current_location, selected_hospital, routes)
     output_file = 'hospital_route.html'
-    m.save(output_file)
+    with loading_animation():
+        html = create_map_with_alternatives(net, current_location, selected_hospital, routes)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(html)
     
     # Display results
     print("\n=== Route Summary ===")
     print(f"Routes to {selected_hospital}:")
-    for i, (_, distance) in enumerate(routes):
+    for i, distance in enumerate(routes.dists):
         distance_km = distance / 1000
         time_min = distance_km / 40 * 60
         route_type = "Shortest" if i == 0 else "Alternative" if i == 1 else "Longest"
@@ -0,0 +1,24 @@
+"""Compile the routing kernels ahead of time into the route_kernels extension.
+
+Run once with `python build_kernels.py`; Interactive.py picks up the built
+module automatically and falls back to JIT compilation when it is missing.
+"""
+import os
+
+from numba.pycc import CC
+
+from kernels import dijkstra_batch, dijkstra_csr
+
+cc = CC('route_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export('dijkstra_csr',
+          'Tuple((f4[::1], i4[::1]))(i4[::1], i4[::1], f4[::1], i4, i4, f4[::1])')(
+    dijkstra_csr.py_func)
+# pycc has no parallel target, so the AOT batch runs its searches serially
+cc.export('dijkstra_batch',
+          'Tuple((f4[:, ::1], i4[:, ::1]))(i4[::1], i4[::1], f4[:, ::1], i4[::1], i4, f4[::1])')(
+    dijkstra_batch.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
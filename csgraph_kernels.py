@@ -0,0 +1,48 @@
+"""SciPy fallback for the routing kernels when Numba is not installed.
+
+Mirrors the signatures in kernels.py on top of scipy.sparse.csgraph, whose
+compiled heap-based Dijkstra runs over the same CSR arrays.
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+# Search radius as a multiple of the heuristic distance from the source;
+# road distance rarely exceeds this within a city
+LIMIT_FACTOR = 1.5
+
+def dijkstra_csr(indptr, indices, weights, src, dst, heuristic):
+    """Dijkstra over a CSR graph, returning (dist, parent) arrays.
+
+    SciPy has no A*, so the heuristic only bounds the search radius; the
+    search is repeated without a bound if dst lies beyond it.
+    """
+    n = indptr.shape[0] - 1
+    rows = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+    # SciPy sums parallel edges when validating the graph, so keep only the
+    # shortest edge between each pair of nodes
+    order = np.lexsort((weights, indices, rows))
+    rows, cols, lengths = rows[order], indices[order], weights[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    graph = csr_matrix((lengths[keep], (rows[keep], cols[keep])), shape=(n, n))
+    limit = np.inf
+    if dst >= 0 and heuristic[src] > 0:
+        limit = heuristic[src] * LIMIT_FACTOR
+    dist, parent = dijkstra(graph, indices=src, return_predecessors=True, limit=limit)
+    if np.isfinite(limit) and not np.isfinite(dist[dst]):
+        dist, parent = dijkstra(graph, indices=src, return_predecessors=True)
+    # SciPy marks missing predecessors with -9999
+    parent = parent.astype(np.int32)
+    parent[parent < 0] = -1
+    return dist.astype(np.float32), parent
+
+def dijkstra_batch(indptr, indices, weight_matrix, srcs, dst, heuristic):
+    """Run dijkstra_csr once per row of weight_matrix, starting from srcs[i]"""
+    results = [dijkstra_csr(indptr, indices, weights, src, dst, heuristic)
+               for weights, src in zip(weight_matrix, srcs)]
+    n = indptr.shape[0] - 1
+    if not results:
+        return np.empty((0, n), np.float32), np.empty((0, n), np.int32)
+    dist, parent = zip(*results)
+    return np.stack(dist), np.stack(parent)
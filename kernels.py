@@ -0,0 +1,100 @@
+"""Numba shortest-path kernels over CSR road graphs.
+
+Imported directly for JIT compilation, or compiled ahead of time into the
+route_kernels extension by build_kernels.py.
+"""
+import numpy as np
+from numba import njit, prange
+
+@njit(cache=True)
+def _heap_push(heap_key, heap_val, size, key, val):
+    """Push (key, val) onto a binary min-heap stored in two arrays"""
+    i = size
+    heap_key[i] = key
+    heap_val[i] = val
+    while i > 0:
+        parent = (i - 1) >> 1
+        if heap_key[parent] <= heap_key[i]:
+            break
+        heap_key[parent], heap_key[i] = heap_key[i], heap_key[parent]
+        heap_val[parent], heap_val[i] = heap_val[i], heap_val[parent]
+        i = parent
+    return size + 1
+
+@njit(cache=True)
+def _heap_pop(heap_key, heap_val, size):
+    """Pop the value with the smallest key, returning (val, new_size)"""
+    val = heap_val[0]
+    size -= 1
+    heap_key[0] = heap_key[size]
+    heap_val[0] = heap_val[size]
+    i = 0
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            break
+        if child + 1 < size and heap_key[child + 1] < heap_key[child]:
+            child += 1
+        if heap_key[i] <= heap_key[child]:
+            break
+        heap_key[child], heap_key[i] = heap_key[i], heap_key[child]
+        heap_val[child], heap_val[i] = heap_val[i], heap_val[child]
+        i = child
+    return val, size
+
+@njit(cache=True)
+def _dijkstra_inplace(indptr, indices, weights, src, dst, heuristic, dist, parent):
+    """A* search writing into caller-provided dist (inf) and parent (-1) arrays"""
+    n = indptr.shape[0] - 1
+    done = np.zeros(n, np.bool_)
+    # Every relaxation pushes once, so m + 1 slots are always enough
+    heap_key = np.empty(indices.shape[0] + 1, np.float32)
+    heap_val = np.empty(indices.shape[0] + 1, np.int32)
+
+    dist[src] = 0.0
+    size = _heap_push(heap_key, heap_val, 0, 0.0, src)
+    while size > 0:
+        u, size = _heap_pop(heap_key, heap_val, size)
+        if done[u]:
+            continue
+        done[u] = True
+        if u == dst:
+            break
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            candidate = dist[u] + weights[e]
+            if candidate < dist[v]:
+                dist[v] = candidate
+                parent[v] = u
+                size = _heap_push(heap_key, heap_val, size, candidate + heuristic[v], v)
+
+@njit(cache=True)
+def dijkstra_csr(indptr, indices, weights, src, dst, heuristic):
+    """A* search over a CSR graph, returning (dist, parent) arrays.
+
+    heuristic must be a per-node lower bound on the distance to dst. Pass
+    zeros and dst = -1 to grow the full shortest-path tree from src.
+    """
+    n = indptr.shape[0] - 1
+    # float32 distances keep the heap and dist arrays half the size; metre
+    # precision is plenty for city-scale routes
+    dist = np.full(n, np.inf, np.float32)
+    parent = np.full(n, -1, np.int32)
+    _dijkstra_inplace(indptr, indices, weights, src, dst, heuristic, dist, parent)
+    return dist, parent
+
+@njit(cache=True, parallel=True)
+def dijkstra_batch(indptr, indices, weight_matrix, srcs, dst, heuristic):
+    """Run one A* search per row of weight_matrix, starting from srcs[i].
+
+    The searches only share the read-only CSR arrays, so they run in
+    parallel threads. Returns (k, n) dist and parent arrays.
+    """
+    k = srcs.shape[0]
+    n = indptr.shape[0] - 1
+    dist = np.full((k, n), np.inf, np.float32)
+    parent = np.full((k, n), -1, np.int32)
+    for i in prange(k):
+        _dijkstra_inplace(indptr, indices, weight_matrix[i], srcs[i], dst, heuristic,
+                          dist[i], parent[i])
+    return dist, parent